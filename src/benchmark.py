@@ -0,0 +1,485 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import faiss
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import instrumentation
+import synthetic_data
+from evaluation import RUN_COLUMNS, build_qrels_dict, evaluate
+from hybrid_retrieval import ALPHA, fuse_results, save_hybrid_results
+
+# Configuration
+NUM_DOCS = 10000
+NUM_QUERIES = 100
+EMBEDDING_DIM = 768  # LaBSE; memory for the doc matrix is NUM_DOCS * EMBEDDING_DIM * 4 bytes
+TOP_K = 1000
+INDEX_TYPES = ["Flat", "IVFFlat", "HNSW", "IVFPQ"]
+STAGES = ["preprocess", "encode", "faiss", "bm25", "fusion", "evaluation"]
+PREPROCESS_SAMPLE = 500
+ENCODE_SAMPLE = 1000
+LATENCY_QUERIES = 100
+REPEATS = 5  # timed passes per measurement; the fastest is reported
+MIN_PASS_SECONDS = 0.2  # fast calls are looped until a timed pass lasts this long
+NPROBE = 16
+HNSW_M = 32
+HNSW_EF_SEARCH = 128
+TRAIN_POINTS_PER_LIST = 64  # caps IVF/PQ training cost on large corpora
+MIN_POINTS_PER_LIST = 39
+BM25_K1 = 1.2  # Elasticsearch defaults
+BM25_B = 0.75
+QUERY_NOISE = 0.5
+RESULTS_DIR = "../results/benchmarks"
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _timed_repeats(repeats, fn, *args, warmup=True, **kwargs):
+    """Fastest of repeated calls, after one untimed warm-up call.
+
+    The minimum is the least disturbed by other load on the machine. Builds and
+    data generation pass warmup=False: a warm-up pass would only add cost.
+    """
+    if warmup:
+        fn(*args, **kwargs)
+    result, timings = None, []
+    for _ in range(repeats):
+        result = None  # release the previous result before building the next one
+        result, seconds = _timed(fn, *args, **kwargs)
+        timings.append(seconds)
+    return result, float(np.min(timings))
+
+
+def _timed_loops(repeats, fn, *args, **kwargs):
+    """Like _timed_repeats, but each pass loops fn for at least MIN_PASS_SECONDS.
+
+    Returns the fastest per-call time. A single batch search on a small index
+    takes a few milliseconds, where scheduler jitter alone moves it by 20%.
+    """
+    result, seconds = _timed(fn, *args, **kwargs)  # warm-up, also sizes the loop
+    loops = max(1, int(np.ceil(MIN_PASS_SECONDS / max(seconds, 1e-9))))
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            result = fn(*args, **kwargs)
+        timings.append((time.perf_counter() - start) / loops)
+    return result, float(np.min(timings))
+
+
+def _query_latencies(repeats, search, queries):
+    """Per-query fastest latency over repeated passes, after one untimed warm-up pass"""
+    for query in queries:
+        search(query)
+    timings = np.empty((repeats, len(queries)))
+    for r in range(repeats):
+        for i, query in enumerate(queries):
+            _, timings[r, i] = _timed(search, query)
+    return np.min(timings, axis=0)
+
+
+def _latency_stats(latencies):
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "latency_mean_ms": float(latencies_ms.mean()),
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+        "latency_p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def _run_frame(qids, doc_indices, scores, method):
+    """Build a run DataFrame with the columns of a TREC results file"""
+    rows = []
+    for qid, query_docs, query_scores in zip(qids, doc_indices, scores):
+        rank = 0
+        for doc_idx, score in zip(query_docs, query_scores):
+            if doc_idx < 0:  # FAISS pads with -1 when fewer than k hits exist
+                continue
+            rank += 1
+            rows.append((qid, "Q0", synthetic_data.synthetic_doc_id(doc_idx), rank, float(score), method))
+    return pd.DataFrame(rows, columns=RUN_COLUMNS)
+
+
+# ---------------------------------------------------------------- embeddings
+def synthetic_embeddings(num_docs, relevant_docs, dim, seed, chunk_size=100_000):
+    """Random unit-norm doc vectors; each query is a noisy copy of its relevant doc"""
+    rng = np.random.default_rng(seed + 2)
+    doc_embeddings = np.empty((num_docs, dim), dtype=np.float32)
+    for start in range(0, num_docs, chunk_size):
+        end = min(start + chunk_size, num_docs)
+        doc_embeddings[start:end] = rng.standard_normal((end - start, dim), dtype=np.float32)
+    faiss.normalize_L2(doc_embeddings)
+
+    noise = rng.standard_normal((len(relevant_docs), dim), dtype=np.float32) * (QUERY_NOISE / dim ** 0.5)
+    query_embeddings = doc_embeddings[relevant_docs] + noise
+    faiss.normalize_L2(query_embeddings)
+    return doc_embeddings, query_embeddings
+
+
+def _num_lists(num_docs):
+    # FAISS k-means wants at least 39 training points per centroid
+    return max(1, min(int(4 * np.sqrt(num_docs)), num_docs // MIN_POINTS_PER_LIST))
+
+
+def _pq_subquantizers(dim):
+    # Largest divisor of dim that gives sub-vectors of at least 8 dimensions
+    return max(m for m in range(1, min(64, dim // 8) + 1) if dim % m == 0) if dim >= 8 else 1
+
+
+def make_index(index_type, dim, num_docs):
+    nlist = _num_lists(num_docs)
+    factory = {
+        "Flat": "Flat",
+        "IVFFlat": f"IVF{nlist},Flat",
+        "HNSW": f"HNSW{HNSW_M}",
+        # "np" skips polysemous training, which dominates build time otherwise
+        "IVFPQ": f"IVF{nlist},PQ{_pq_subquantizers(dim)}np",
+    }[index_type]
+    index = faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT)
+    if "IVF" in factory:
+        faiss.extract_index_ivf(index).nprobe = NPROBE
+    if index_type == "HNSW":
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index, factory
+
+
+# ---------------------------------------------------------------- stages
+def bench_preprocess(tokens, offsets, ru_vocab, query_terms, en_vocab, repeats):
+    try:
+        # preprocess loads both spaCy pipelines at import time
+        _, load_seconds = _timed(__import__, "preprocess")
+        from preprocess import preprocess_russian, preprocess_topics
+    except (ImportError, OSError) as e:
+        return {"skipped": f"spaCy pipelines unavailable: {e}"}
+
+    docs = list(synthetic_data.iter_documents(tokens, offsets, ru_vocab, limit=PREPROCESS_SAMPLE))
+    topics = [synthetic_data.raw_topic(t) for t in synthetic_data.iter_topics(query_terms, en_vocab)]
+    _, doc_seconds = _timed_repeats(repeats, lambda: [preprocess_russian(doc) for doc in docs])
+    _, topic_seconds = _timed_repeats(repeats, lambda: [preprocess_topics(topic) for topic in topics])
+    return {
+        "model_load_seconds": load_seconds,
+        "docs": len(docs),
+        "doc_seconds": doc_seconds,
+        "docs_per_sec": len(docs) / doc_seconds,
+        "topics": len(topics),
+        "topic_seconds": topic_seconds,
+        "topics_per_sec": len(topics) / topic_seconds,
+    }
+
+
+def bench_encode(tokens, offsets, ru_vocab, repeats):
+    try:
+        from sentence_transformers import SentenceTransformer
+        from embedding import MODEL_NAME, generate_embeddings
+        # Never download: only benchmark a model that is already cached
+        model, load_seconds = _timed(SentenceTransformer, MODEL_NAME, local_files_only=True)
+    except Exception as e:
+        return {"skipped": f"encoder unavailable offline: {e}"}
+
+    texts = [doc["text"] for doc in synthetic_data.iter_documents(tokens, offsets, ru_vocab, limit=ENCODE_SAMPLE)]
+    embeddings, encode_seconds = _timed_repeats(repeats, generate_embeddings, model, texts)
+    return {
+        "model": MODEL_NAME,
+        "model_load_seconds": load_seconds,
+        "docs": len(texts),
+        "dim": int(embeddings.shape[1]),
+        "encode_seconds": encode_seconds,
+        "docs_per_sec": len(texts) / encode_seconds,
+    }
+
+
+def bench_faiss(doc_embeddings, query_embeddings, index_types, top_k, repeats):
+    results, searches = {}, {}
+    num_docs, dim = doc_embeddings.shape
+    k = min(top_k, num_docs)
+    train_sample = doc_embeddings[:TRAIN_POINTS_PER_LIST * _num_lists(num_docs)]
+    for index_type in index_types:
+        print(f"  {index_type}...")
+        # Each repeat builds a fresh index; the last one is kept for searching
+        train_times, add_times = [], []
+        for _ in range(repeats):
+            index, factory = make_index(index_type, dim, num_docs)
+            _, seconds = _timed(index.train, train_sample)
+            train_times.append(seconds)
+            _, seconds = _timed(index.add, doc_embeddings)
+            add_times.append(seconds)
+        train_seconds = float(np.min(train_times))
+        add_seconds = float(np.min(add_times))
+
+        (scores, indices), batch_seconds = _timed_loops(repeats, index.search, query_embeddings, k)
+        latencies = _query_latencies(
+            repeats,
+            lambda query: index.search(query, k),
+            [query_embeddings[i:i + 1] for i in range(min(LATENCY_QUERIES, len(query_embeddings)))]
+        )
+
+        results[index_type] = {
+            "factory": factory,
+            "train_points": len(train_sample) if "IVF" in factory else 0,
+            "train_seconds": train_seconds,
+            "add_seconds": add_seconds,
+            "build_seconds": train_seconds + add_seconds,
+            "batch_search_seconds": batch_seconds,
+            "qps": len(query_embeddings) / batch_seconds,
+            **_latency_stats(latencies),
+        }
+        searches[index_type] = (scores, indices)
+    return results, searches
+
+
+def build_bm25_index(tokens, offsets, vocab_size, k1=BM25_K1, b=BM25_B):
+    """Precompute per-(doc, term) BM25 weights as a CSC matrix.
+
+    Local stand-in for the Elasticsearch index: a query's scores are the sum of
+    its term columns, which is what a match query does under the hood.
+    """
+    num_docs = len(offsets) - 1
+    # copy=True: sum_duplicates() sorts and compacts indices/indptr in place,
+    # which would otherwise rewrite the caller's corpus arrays
+    weights = sparse.csr_matrix(
+        (np.ones(len(tokens), dtype=np.float32), tokens, offsets),
+        shape=(num_docs, vocab_size), copy=True
+    )
+    weights.sum_duplicates()
+
+    doc_len = np.diff(offsets).astype(np.float32)
+    df = np.bincount(weights.indices, minlength=vocab_size)
+    idf = np.log1p((num_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+    row_len = np.repeat(doc_len / doc_len.mean(), np.diff(weights.indptr))
+    tf = weights.data
+    weights.data = idf[weights.indices] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * row_len))
+    return weights.tocsc()
+
+
+def bm25_search(bm25_index, terms, k):
+    scores = np.asarray(bm25_index[:, terms].sum(axis=1)).ravel()
+    candidates = np.flatnonzero(scores)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    top = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return top, scores[top]
+
+
+def bench_bm25(tokens, offsets, vocab_size, query_terms, relevant_docs, top_k, repeats):
+    bm25_index, index_seconds = _timed_repeats(
+        repeats, build_bm25_index, tokens, offsets, vocab_size, warmup=False
+    )
+
+    # Every query is drawn from its relevant doc, so each of its terms must carry weight there
+    indexed = sum(bool(np.all(bm25_index[doc_idx, terms].toarray())) for doc_idx, terms in zip(relevant_docs, query_terms))
+    assert indexed == len(query_terms), f"Only {indexed}/{len(query_terms)} queries match their source doc; BM25 index is corrupt!"
+
+    hits = [bm25_search(bm25_index, terms, top_k) for terms in query_terms]
+    latencies = _query_latencies(repeats, lambda terms: bm25_search(bm25_index, terms, top_k), query_terms)
+
+    total_seconds = float(latencies.sum())
+    stats = {
+        "backend": "scipy.sparse BM25 (Elasticsearch stand-in)",
+        "index_seconds": index_seconds,
+        "docs_per_sec": (len(offsets) - 1) / index_seconds,
+        "search_seconds": total_seconds,
+        "qps": len(query_terms) / total_seconds,
+        **_latency_stats(latencies),
+        "recall": sum(doc_idx in top for (top, _), doc_idx in zip(hits, relevant_docs)) / len(query_terms),
+    }
+    return stats, hits
+
+
+def bench_fusion(bm25_df, clir_df, repeats):
+    # fuse_results adds a norm_score column to its inputs, which is safe to redo
+    bm25_df, clir_df = bm25_df.copy(), clir_df.copy()
+    merged, fuse_seconds = _timed_repeats(repeats, fuse_results, bm25_df, clir_df, ALPHA)
+    with tempfile.TemporaryDirectory() as tmp:
+        _, write_seconds = _timed_repeats(
+            repeats, save_hybrid_results, merged, os.path.join(tmp, "hybrid.trec")
+        )
+    return {
+        "rows": len(merged),
+        "fuse_seconds": fuse_seconds,
+        "write_seconds": write_seconds,
+        "total_seconds": fuse_seconds + write_seconds,
+    }, merged
+
+
+def bench_evaluation(relevant_docs, runs, repeats):
+    qrels_df = pd.DataFrame(
+        [line.split() for line in synthetic_data.qrels_lines(relevant_docs)],
+        columns=["qid", "iteration", "docid", "relevance"]
+    )
+    qrels_dict, qrels_seconds = _timed_repeats(repeats, build_qrels_dict, qrels_df)
+
+    stats = {"qrels_seconds": qrels_seconds}
+    metrics = {}
+    for name, run_df in runs.items():
+        # evaluate() prints its metrics; keep the repeated passes quiet
+        with contextlib.redirect_stdout(io.StringIO()):
+            metrics[name], seconds = _timed_repeats(repeats, evaluate, run_df, name, qrels_dict)
+        stats[f"{name}_seconds"] = seconds
+    stats["total_seconds"] = sum(v for k, v in stats.items() if k.endswith("_seconds"))
+    stats["metrics"] = metrics
+    return stats
+
+
+# ---------------------------------------------------------------- reporting
+def _environment():
+    return {**instrumentation.environment(), "numpy": np.__version__, "faiss": faiss.__version__}
+
+
+def run_benchmarks(num_docs, num_queries, dim, index_types, top_k, stages, seed, repeats=REPEATS,
+                   corpus_dir=None):
+    config = {
+        "num_docs": num_docs, "num_queries": num_queries, "dim": dim, "top_k": top_k,
+        "index_types": index_types, "stages": stages, "seed": seed,
+        "vocab_size": synthetic_data.VOCAB_SIZE, "mean_doc_length": synthetic_data.MEAN_DOC_LENGTH,
+        "nprobe": NPROBE, "hnsw_m": HNSW_M, "hnsw_ef_search": HNSW_EF_SEARCH, "alpha": ALPHA,
+        "repeats": repeats,
+    }
+    results = {"environment": _environment(), "config": config, "stages": {}}
+    report = results["stages"]
+
+    print(f"Generating synthetic corpus: {num_docs} docs, {num_queries} queries...")
+    with instrumentation.stage("generate"):
+        ru_vocab, en_vocab = synthetic_data.build_vocabularies()
+        (tokens, offsets), corpus_seconds = _timed_repeats(
+            repeats, synthetic_data.generate_corpus, num_docs, seed=seed, warmup=False
+        )
+        (query_terms, relevant_docs), query_seconds = _timed_repeats(
+            repeats, synthetic_data.generate_queries, tokens, offsets, num_queries, seed=seed
+        )
+    report["generate"] = {
+        "tokens": int(len(tokens)),
+        "corpus_seconds": corpus_seconds,
+        "docs_per_sec": num_docs / corpus_seconds,
+        "query_seconds": query_seconds,
+    }
+
+    if corpus_dir:
+        os.makedirs(corpus_dir, exist_ok=True)
+        with instrumentation.stage("write_corpus"):
+            synthetic_data.write_jsonl(os.path.join(corpus_dir, "russian_documents.jsonl"),
+                                       synthetic_data.iter_documents(tokens, offsets, ru_vocab))
+            synthetic_data.write_jsonl(os.path.join(corpus_dir, "processed_topics.jsonl"),
+                                       synthetic_data.iter_topics(query_terms, en_vocab))
+            with open(os.path.join(corpus_dir, "qrels.txt"), "w", encoding="utf-8") as f:
+                for line in synthetic_data.qrels_lines(relevant_docs):
+                    f.write(line + "\n")
+        print(f"Wrote synthetic corpus to {corpus_dir}")
+
+    if "preprocess" in stages:
+        print("\nBenchmarking preprocessing...")
+        with instrumentation.stage("preprocess"):
+            report["preprocess"] = bench_preprocess(tokens, offsets, ru_vocab, query_terms, en_vocab, repeats)
+
+    if "encode" in stages:
+        print("\nBenchmarking encoding...")
+        with instrumentation.stage("encode"):
+            report["encode"] = bench_encode(tokens, offsets, ru_vocab, repeats)
+
+    qids = synthetic_data.topic_ids(num_queries)
+    runs = {}
+    if {"faiss", "fusion", "evaluation"} & set(stages):
+        print("\nBenchmarking FAISS indexes...")
+        # Fusion and evaluation need a dense run even when only "faiss" was skipped
+        faiss_types = index_types if "faiss" in stages else ["Flat"]
+        with instrumentation.stage("faiss"):
+            (doc_embeddings, query_embeddings), embed_seconds = _timed_repeats(
+                repeats, synthetic_embeddings, num_docs, relevant_docs, dim, seed, warmup=False
+            )
+            faiss_stats, searches = bench_faiss(doc_embeddings, query_embeddings, faiss_types, top_k, repeats)
+        if "faiss" in stages:
+            report["faiss"] = {"embedding_seconds": embed_seconds, **faiss_stats}
+        scores, indices = searches.get("Flat", next(iter(searches.values())))
+        runs["FAISS"] = _run_frame(qids, indices, scores, "CLIR_Project")
+        del doc_embeddings
+
+    if {"bm25", "fusion", "evaluation"} & set(stages):
+        print("\nBenchmarking BM25 stand-in...")
+        with instrumentation.stage("bm25"):
+            bm25_stats, hits = bench_bm25(
+                tokens, offsets, synthetic_data.VOCAB_SIZE, query_terms, relevant_docs, top_k, repeats
+            )
+        if "bm25" in stages:
+            report["bm25"] = bm25_stats
+        runs["BM25"] = _run_frame(qids, [h[0] for h in hits], [h[1] for h in hits], "BM25_Elastic")
+
+    if {"fusion", "evaluation"} & set(stages):
+        print("\nBenchmarking fusion...")
+        with instrumentation.stage("fusion"):
+            fusion_stats, merged = bench_fusion(runs["BM25"], runs["FAISS"], repeats)
+        if "fusion" in stages:
+            report["fusion"] = fusion_stats
+        merged = merged.assign(rank=merged.groupby("qid").cumcount() + 1)
+        runs["Hybrid"] = merged[["qid", "docid", "rank"]]
+
+    if "evaluation" in stages:
+        print("\nBenchmarking evaluation...")
+        with instrumentation.stage("evaluation"):
+            report["evaluation"] = bench_evaluation(relevant_docs, runs, repeats)
+
+    results["peak_rss_mb"] = instrumentation.peak_rss_mb()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval benchmarks on a synthetic corpus (no downloads)")
+    parser.add_argument("--docs", type=int, default=NUM_DOCS, help="number of synthetic documents (10k-10M)")
+    parser.add_argument("--queries", type=int, default=NUM_QUERIES)
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM, help="embedding dimension")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--index-types", nargs="+", default=INDEX_TYPES, choices=INDEX_TYPES)
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--seed", type=int, default=synthetic_data.SEED)
+    parser.add_argument("--repeats", type=int, default=REPEATS,
+                        help="timed passes per measurement, fastest reported (use 1 for very large corpora)")
+    parser.add_argument("--output", help="results JSON path (default: timestamped file in results/benchmarks)")
+    parser.add_argument("--write-corpus", metavar="DIR", help="also write the synthetic corpus, topics and qrels")
+    parser.add_argument("--compare", metavar="BASELINE", help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=instrumentation.REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    # The trace holds one stage per benchmark section, plus stages recorded by
+    # the pipeline code under test (spaCy load, encode chunks, ...)
+    with instrumentation.run("benchmark"):
+        results = run_benchmarks(args.docs, args.queries, args.dim, args.index_types, args.top_k,
+                                 args.stages, args.seed, repeats=args.repeats, corpus_dir=args.write_corpus)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"bench_{args.docs}_{stamp}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved benchmark results to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        differing = [k for k, v in results["config"].items() if k != "stages" and baseline["config"].get(k) != v]
+        if differing:
+            print(f"\n⚠️ Baseline was run with a different config ({', '.join(differing)}); timings may not be comparable")
+        regressions = instrumentation.compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions over {args.tolerance:.0%} vs {args.compare}:")
+            for path, old, new, change in regressions:
+                print(f"  {path}: {old:.4g} -> {new:.4g} ({change:+.1%})")
+            sys.exit(1)
+        print(f"\n✅ No regressions over {args.tolerance:.0%} vs {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,14 @@ import numpy as np
 from sentence_transformers import SentenceTransformer
 import json
 from tqdm import tqdm
+import instrumentation as instr
 
 # Configuration
 DOCUMENTS_PATH = "../data/processed_data/russian_documents.jsonl"
 TOPICS_PATH = "../data/processed_data/processed_topics.jsonl"
 MODEL_NAME = "sentence-transformers/LaBSE"
 BATCH_SIZE = 256
+ENCODE_CHUNK = BATCH_SIZE * 16  # texts per timed encode call
 
 
 # ✅ Load both text and ID from Russian documents
@@ -19,6 +21,7 @@ def load_texts_and_ids(file_path):
             obj = json.loads(line)
             texts.append(obj["text"])
             ids.append(obj["id"])
+    instr.count("documents_loaded", len(ids))
     return texts, ids
 
 
@@ -31,50 +34,66 @@ def load_queries_with_ids(file_path):
             obj = json.loads(line)
             texts.append(obj["text"])
             topic_ids.append(obj.get("topic_id"))
+    instr.count("queries_loaded", len(topic_ids))
     return texts, topic_ids
 
 
 def generate_embeddings(model, texts):
-    return model.encode(
-        texts,
-        batch_size=BATCH_SIZE,
-        show_progress_bar=True,
-        convert_to_numpy=True
-    )
+    if not texts:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    # Encode in chunks of several batches so each chunk shows up in the trace
+    chunks = []
+    for i in tqdm(range(0, len(texts), ENCODE_CHUNK), desc="Encoding chunks"):
+        with instr.stage("encode_chunk"):
+            chunks.append(model.encode(
+                texts[i:i + ENCODE_CHUNK],
+                batch_size=BATCH_SIZE,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            ))
+    instr.count("texts_encoded", len(texts))
+    return np.concatenate(chunks)
 
 
 def main():
     # 1. Load model
-    model = SentenceTransformer(MODEL_NAME)
+    with instr.stage("model_load"):
+        model = SentenceTransformer(MODEL_NAME)
 
     # 2. Load Russian documents
     print("Loading documents...")
-    russian_texts, doc_ids = load_texts_and_ids(DOCUMENTS_PATH)
+    with instr.stage("load_documents"):
+        russian_texts, doc_ids = load_texts_and_ids(DOCUMENTS_PATH)
 
     # 3. Load English queries
     print("\nLoading queries...")
-    english_queries, query_ids = load_queries_with_ids(TOPICS_PATH)
+    with instr.stage("load_queries"):
+        english_queries, query_ids = load_queries_with_ids(TOPICS_PATH)
 
     # 4. Generate embeddings
     print("\nGenerating document embeddings...")
-    doc_embeddings = generate_embeddings(model, russian_texts)
+    with instr.stage("encode_documents"):
+        doc_embeddings = generate_embeddings(model, russian_texts)
 
     print("\nGenerating query embeddings...")
-    query_embeddings = generate_embeddings(model, english_queries)
+    with instr.stage("encode_queries"):
+        query_embeddings = generate_embeddings(model, english_queries)
 
     # 5. Save embeddings
-    np.save("../data/embeddings/russian_docs.npy", doc_embeddings)
-    np.save("../data/embeddings/english_queries.npy", query_embeddings)
+    with instr.stage("file_write"):
+        np.save("../data/embeddings/russian_docs.npy", doc_embeddings)
+        np.save("../data/embeddings/english_queries.npy", query_embeddings)
 
-    # ✅ Save document UUIDs
-    with open("../data/embeddings/doc_ids.txt", "w", encoding="utf-8") as f:
-        for doc_id in doc_ids:
-            f.write(doc_id + "\n")
+        # ✅ Save document UUIDs
+        with open("../data/embeddings/doc_ids.txt", "w", encoding="utf-8") as f:
+            for doc_id in doc_ids:
+                f.write(doc_id + "\n")
 
-    # ✅ Save topic IDs (aligned with query embeddings)
-    with open("../data/embeddings/query_ids.txt", "w", encoding="utf-8") as f:
-        for qid in query_ids:
-            f.write(str(qid) + "\n")
+        # ✅ Save topic IDs (aligned with query embeddings)
+        with open("../data/embeddings/query_ids.txt", "w", encoding="utf-8") as f:
+            for qid in query_ids:
+                f.write(str(qid) + "\n")
 
     # Optional debug
     print(f"\nSaved {len(doc_ids)} document IDs and {len(query_ids)} query IDs.")
@@ -83,4 +102,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    with instr.run("embedding"):
+        main()
@@ -1,6 +1,7 @@
 import faiss
 import numpy as np
 import os
+import instrumentation as instr
 
 
 def main():
@@ -17,19 +18,21 @@ def main():
     os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
 
     # 1. Load embeddings
-    print("Loading document embeddings...")
-    doc_embeddings = np.load(DOC_EMBEDDINGS_PATH).astype(np.float32)
+    with instr.stage("load_embeddings"):
+        print("Loading document embeddings...")
+        doc_embeddings = np.load(DOC_EMBEDDINGS_PATH).astype(np.float32)
 
-    print("Loading query embeddings...")
-    query_embeddings = np.load(QUERY_EMBEDDINGS_PATH).astype(np.float32)
+        print("Loading query embeddings...")
+        query_embeddings = np.load(QUERY_EMBEDDINGS_PATH).astype(np.float32)
 
-    # ✅ Load real document IDs
-    with open(DOC_IDS_PATH, "r", encoding="utf-8") as f:
-        doc_ids = [line.strip() for line in f]
+    with instr.stage("load_ids"):
+        # ✅ Load real document IDs
+        with open(DOC_IDS_PATH, "r", encoding="utf-8") as f:
+            doc_ids = [line.strip() for line in f]
 
-    # ✅ Load real topic IDs
-    with open(QUERY_IDS_PATH, "r", encoding="utf-8") as f:
-        query_ids = [line.strip() for line in f]
+        # ✅ Load real topic IDs
+        with open(QUERY_IDS_PATH, "r", encoding="utf-8") as f:
+            query_ids = [line.strip() for line in f]
 
     # Sanity checks
     assert len(doc_ids) == doc_embeddings.shape[0], "Mismatch between doc IDs and embeddings!"
@@ -37,24 +40,29 @@ def main():
 
     # 2. Normalize embeddings
     print("\nNormalizing embeddings...")
-    faiss.normalize_L2(doc_embeddings)
-    faiss.normalize_L2(query_embeddings)
+    with instr.stage("normalize"):
+        faiss.normalize_L2(doc_embeddings)
+        faiss.normalize_L2(query_embeddings)
 
     # 3. Build and save FAISS index
     print("\nBuilding FAISS index...")
     dimension = doc_embeddings.shape[1]
-    index = faiss.IndexFlatIP(dimension)  # Inner Product = Cosine Similarity
-    index.add(doc_embeddings)
-    faiss.write_index(index, FAISS_INDEX_PATH)
+    with instr.stage("index_build"):
+        index = faiss.IndexFlatIP(dimension)  # Inner Product = Cosine Similarity
+        index.add(doc_embeddings)
+    with instr.stage("index_write"):
+        faiss.write_index(index, FAISS_INDEX_PATH)
     print(f"Index built with {index.ntotal} documents")
 
     # 4. Perform retrieval
     print("\nPerforming search...")
-    scores, indices = index.search(query_embeddings, 1000)
+    with instr.stage("search"):
+        scores, indices = index.search(query_embeddings, 1000)
+    instr.count("queries_searched", len(query_embeddings))
 
     # 5. Save results in TREC format
     print("\nSaving results...")
-    with open(RESULTS_PATH, "w", encoding="utf-8") as f:
+    with instr.stage("file_write"), open(RESULTS_PATH, "w", encoding="utf-8") as f:
         for i, (query_scores, query_indices) in enumerate(zip(scores, indices)):
             topic_id = query_ids[i]  # ✅ use actual topic ID
             for rank, (score, doc_idx) in enumerate(zip(query_scores, query_indices)):
@@ -66,4 +74,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    with instr.run("faiss_retrieval"):
+        main()
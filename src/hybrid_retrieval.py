@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
+import instrumentation as instr
 
 # Configuration
 BM25_RESULTS = "../results/bm25_results.trec"
@@ -19,15 +20,8 @@ def load_results(file_path):
     )
 
 
-def main():
-    print("🚀 Loading BM25 and CLIR results...")
-
-    # Load both result sets
-    bm25_df = load_results(BM25_RESULTS)
-    clir_df = load_results(CLIR_RESULTS)
-
-    print("\n🔗 Combining results using alpha={}...".format(ALPHA))
-
+def fuse_results(bm25_df, clir_df, alpha=ALPHA):
+    """Min-max normalize both runs per query and combine them into a ranked DataFrame"""
     # Normalize scores per query
     for df in [bm25_df, clir_df]:
         df["norm_score"] = df.groupby("qid")["score"].transform(
@@ -45,27 +39,47 @@ def main():
 
     # Calculate hybrid score
     merged["hybrid_score"] = (
-            ALPHA * merged["norm_score_bm25"] +
-            (1 - ALPHA) * merged["norm_score_clir"]
+            alpha * merged["norm_score_bm25"] +
+            (1 - alpha) * merged["norm_score_clir"]
     )
 
     # Sort and rank
-    merged = merged.sort_values(
+    return merged.sort_values(
         by=["qid", "hybrid_score"],
         ascending=[True, False]
     )
 
-    # Generate final rankings
-    print("\n💾 Saving hybrid results...")
-    with open(HYBRID_RESULTS, "w") as f:
+
+def save_hybrid_results(merged, file_path):
+    """Write fused rankings in TREC format"""
+    with open(file_path, "w") as f:
         for (qid, group) in tqdm(merged.groupby("qid"), desc="Processing queries"):
             for rank, (_, row) in enumerate(group.iterrows(), 1):
                 f.write(
                     f"{qid} Q0 {row['docid']} {rank} {row['hybrid_score']:.6f} Hybrid\n"
                 )
 
+
+def main():
+    print("🚀 Loading BM25 and CLIR results...")
+
+    # Load both result sets
+    with instr.stage("load_results"):
+        bm25_df = load_results(BM25_RESULTS)
+        clir_df = load_results(CLIR_RESULTS)
+
+    print("\n🔗 Combining results using alpha={}...".format(ALPHA))
+    with instr.stage("fuse"):
+        merged = fuse_results(bm25_df, clir_df)
+
+    # Generate final rankings
+    print("\n💾 Saving hybrid results...")
+    with instr.stage("file_write"):
+        save_hybrid_results(merged, HYBRID_RESULTS)
+
     print("\n✅ Hybrid results saved to", HYBRID_RESULTS)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with instr.run("hybrid_retrieval"):
+        main()
\ No newline at end of file
@@ -0,0 +1,325 @@
+import argparse
+import cProfile
+import json
+import os
+import platform
+import pstats
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Configuration
+TRACE_DIR = "../results/traces"
+PROFILE_ENV = "CLIR_PROFILE"  # set to 1 to run cProfile alongside the stage timers
+PROFILE_TOP = 25
+REGRESSION_TOLERANCE = 0.10
+MIN_COMPARABLE_SECONDS = 1e-3  # sub-millisecond stage timings are mostly noise
+# Sibling timings that throughput and per-query latency leaves are derived
+# from; the noise floor is applied to these aggregates instead
+RATE_BASIS = {
+    "qps": ("batch_search_seconds", "search_seconds"),
+    "docs_per_sec": ("corpus_seconds", "index_seconds", "doc_seconds", "encode_seconds"),
+    "topics_per_sec": ("topic_seconds",),
+}
+LATENCY_BASIS = ("batch_search_seconds", "search_seconds")
+
+# Process-wide recorder: stage timings keyed by "outer/inner" path, plus counters.
+# Stages recorded outside any run (e.g. spaCy loads when preprocess.py is
+# imported) are kept and reported by the next run.
+_stages = {}
+_counters = {}
+_stack = []
+_runs = []
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unavailable"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return _windows_peak_rss_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def _windows_peak_rss_mb():
+    try:
+        import ctypes
+        from ctypes import wintypes
+    except ImportError:
+        return None
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    try:
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        get_process = ctypes.windll.kernel32.GetCurrentProcess
+        get_process.restype = wintypes.HANDLE
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(get_process(), ctypes.byref(counters), counters.cb):
+            return None
+    except (AttributeError, OSError):
+        return None
+    return counters.PeakWorkingSetSize / 2 ** 20
+
+
+def _add(path, elapsed):
+    stats = _stages.get(path)
+    if stats is None:
+        stats = _stages[path] = {"calls": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+    stats["calls"] += 1
+    stats["total_seconds"] += elapsed
+    stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+
+@contextmanager
+def stage(name):
+    """Time a stage; stages opened inside it are recorded as sub-steps.
+
+    Costs a few microseconds per call, so wrap whole loops rather than
+    individual lines.
+    """
+    _stack.append(name)
+    path = "/".join(_stack)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add(path, time.perf_counter() - start)
+        _stack.pop()
+
+
+def record(name, seconds):
+    """Record an interval timed by the caller, for code a with-block can't span (generators)"""
+    _add("/".join(_stack + [name]), seconds)
+
+
+def count(name, n=1):
+    """Increment a named counter (documents indexed, bulk failures, ...)"""
+    _counters[name] = _counters.get(name, 0) + n
+
+
+def environment():
+    try:
+        git_commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        git_commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _profile_summary(profiler, limit=PROFILE_TOP):
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{file}:{line}({func})",
+            "calls": calls,
+            "total_seconds": total,
+            "cumulative_seconds": cumulative,
+        }
+        for (file, line, func), (_, calls, total, cumulative, _) in rows
+    ]
+
+
+def summary(name, wall_seconds, status="ok"):
+    stages = {}
+    for path, stats in _stages.items():
+        stages[path] = {**stats, "mean_seconds": stats["total_seconds"] / stats["calls"]}
+    return {
+        "run": name,
+        "status": status,
+        "environment": environment(),
+        "wall_seconds": wall_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+        "counters": dict(_counters),
+    }
+
+
+@contextmanager
+def run(name, trace_dir=TRACE_DIR, profile=None):
+    """Instrument a whole script run and write its summary JSON on exit.
+
+    The summary is written even if the run fails, so slow or crashing runs can
+    still be compared. With profile=True (or CLIR_PROFILE=1) cProfile is enabled
+    too; the raw .prof file is saved next to the summary. Each run starts from
+    a clean recorder, and a nested run restores the outer run's state on exit.
+    """
+    outer = (dict(_stages), dict(_counters), list(_stack))
+    if _runs:
+        _stages.clear()
+        _counters.clear()
+    _stack.clear()
+    _runs.append(name)
+    if profile is None:
+        profile = os.environ.get(PROFILE_ENV, "") not in ("", "0")
+    profiler = cProfile.Profile() if profile else None
+    status = "ok"
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        with stage(name):
+            yield
+    except BaseException as e:
+        status = f"error: {type(e).__name__}: {e}"
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+        result = summary(name, time.perf_counter() - start, status)
+
+        _runs.pop()
+        _stages.clear()
+        _counters.clear()
+        if _runs:
+            _stages.update(outer[0])
+            _counters.update(outer[1])
+        # Stages still open around the run close after it, even outside any run
+        _stack[:] = outer[2]
+
+        os.makedirs(trace_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        base = os.path.join(trace_dir, f"{name}_{stamp}_{os.getpid()}")
+        if profiler:
+            profiler.dump_stats(base + ".prof")
+            result["profile"] = {"path": base + ".prof", "top": _profile_summary(profiler)}
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n⏱️ {name} finished in {result['wall_seconds']:.1f}s "
+              f"(peak RSS {result['peak_rss_mb'] or 0:.0f} MB), trace saved to {base}.json")
+
+
+def _flatten(stages, prefix=""):
+    flat = {}
+    for key, value in stages.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def _basis_values(base, flat, prefix, names):
+    basis = next((prefix + name for name in names if prefix + name in flat), None)
+    return (base.get(basis, 0), flat[basis]) if basis else (float("inf"),)
+
+
+def compare_results(current, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Return (metric, baseline, current, change) for every timing or peak RSS that got worse than tolerance"""
+    base = _flatten(baseline["stages"])
+    flat = _flatten(current["stages"])
+    regressions = []
+    for path, value in flat.items():
+        old = base.get(path)
+        if not old or not value or ".metrics." in path:
+            continue
+        parent, _, leaf = path.rpartition(".")
+        prefix = f"{parent}." if parent else ""
+        if leaf.endswith("seconds"):
+            floor_values = (old, value)
+            change = value / old - 1
+        elif leaf.endswith("_ms"):
+            # A single query is often well under a millisecond; judge it by the
+            # whole search it belongs to
+            floor_values = _basis_values(base, flat, prefix, LATENCY_BASIS)
+            change = value / old - 1
+        elif leaf.endswith("per_sec") or leaf == "qps":
+            floor_values = _basis_values(base, flat, prefix, RATE_BASIS.get(leaf, ()))
+            change = old / value - 1
+        else:
+            continue
+        if max(floor_values) < MIN_COMPARABLE_SECONDS:
+            continue
+        if change > tolerance:
+            regressions.append((path, old, value, change))
+
+    # Whole-run totals live next to "stages" rather than inside it
+    for key in ("wall_seconds", "peak_rss_mb"):
+        old, value = baseline.get(key), current.get(key)
+        if not old or not value:
+            continue
+        if key == "wall_seconds" and max(old, value) < MIN_COMPARABLE_SECONDS:
+            continue
+        change = value / old - 1
+        if change > tolerance:
+            regressions.append((key, old, value, change))
+    return regressions
+
+
+def _is_trace(result):
+    """True for a run() summary, whose stages map paths to call/timing stats"""
+    return all(isinstance(stats, dict) and "total_seconds" in stats and "calls" in stats
+               for stats in result["stages"].values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two run traces (or two benchmark results) stage by stage")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+
+    if _is_trace(baseline) and _is_trace(current):
+        print(f"{'stage':<50} {'baseline s':>12} {'current s':>12} {'change':>9}")
+        old_stages = baseline["stages"]
+        for path, stats in current["stages"].items():
+            old = old_stages.get(path, {}).get("total_seconds")
+            change = f"{stats['total_seconds'] / old - 1:+.1%}" if old else "new"
+            old_text = f"{old:.3f}" if old is not None else "-"
+            print(f"{path:<50} {old_text:>12} {stats['total_seconds']:>12.3f} {change:>9}")
+    else:
+        # Benchmark results (benchmark.py) nest arbitrary measurements per stage
+        print(f"{'measurement':<50} {'baseline':>12} {'current':>12} {'change':>9}")
+        old_flat = _flatten(baseline["stages"])
+        for path, value in _flatten(current["stages"]).items():
+            old = old_flat.get(path)
+            if old is None:
+                change, old_text = "new", "-"
+            else:
+                change, old_text = (f"{value / old - 1:+.1%}" if old else "-"), f"{old:.4g}"
+            print(f"{path:<50} {old_text:>12} {value:>12.4g} {change:>9}")
+    for key in ("wall_seconds", "peak_rss_mb"):
+        if baseline.get(key) and current.get(key):
+            print(f"{key:<50} {baseline[key]:>12.1f} {current[key]:>12.1f} {current[key] / baseline[key] - 1:>+9.1%}")
+
+    regressions = compare_results(current, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regressions over {args.tolerance:.0%}:")
+        for path, old, new, change in regressions:
+            print(f"  {path}: {old:.4g} -> {new:.4g} ({change:+.1%})")
+        sys.exit(1)
+    print(f"\n✅ No regressions over {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import json
 from tqdm import tqdm
 from preprocess import preprocess_russian
+import instrumentation as instr
 
 
 # Configuration
@@ -13,7 +14,7 @@ def main():
     # 1. Load existing processed IDs
     processed_ids = set()
     try:
-        with open(PROCESSED_DOCS_PATH, "r", encoding="utf-8") as f:
+        with instr.stage("load_processed_ids"), open(PROCESSED_DOCS_PATH, "r", encoding="utf-8") as f:
             for line in tqdm(f, desc="🔄 Loading existing processed IDs"):
                 processed_ids.add(json.loads(line)["id"])
         print(f"✅ Loaded {len(processed_ids)} existing document IDs")
@@ -35,14 +36,16 @@ def main():
     # 3. Find missing docs in raw data
     found_docs = []
     if missing_docs:
-        with open(RAW_DOCS_PATH, "r", encoding="utf-8") as f:
-            for line in tqdm(f, desc="🔎 Scanning raw documents"):
+        scanned = 0
+        with instr.stage("scan_raw_documents"), open(RAW_DOCS_PATH, "r", encoding="utf-8") as f:
+            for scanned, line in enumerate(tqdm(f, desc="🔎 Scanning raw documents"), 1):
                 doc = json.loads(line)
                 if doc["id"] in missing_docs:
                     found_docs.append(doc)
                     missing_docs.remove(doc["id"])
                     if not missing_docs:
                         break
+        instr.count("raw_documents_scanned", scanned)
 
     # 4. Append to processed file with duplicate protection
     new_count = 0
@@ -56,8 +59,10 @@ def main():
                     continue
 
                 # Preprocess and write
-                processed = preprocess_russian(doc)  # Your existing function
-                f.write(json.dumps(processed, ensure_ascii=False) + "\n")
+                with instr.stage("preprocess"):
+                    processed = preprocess_russian(doc)  # Your existing function
+                with instr.stage("file_write"):
+                    f.write(json.dumps(processed, ensure_ascii=False) + "\n")
                 processed_ids.add(doc["id"])
                 new_count += 1
 
@@ -75,4 +80,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with instr.run("load_missing_ids"):
+        main()
\ No newline at end of file
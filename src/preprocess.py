@@ -1,16 +1,21 @@
 import spacy
 import json
+import time
+import instrumentation as instr
 
-# Load the Russian spaCy model
-nlp_ru = spacy.load('ru_core_news_sm')
+with instr.stage("model_load"):
+    # Load the Russian spaCy model
+    nlp_ru = spacy.load('ru_core_news_sm')
 
-# Load the English spaCy model
-nlp_en = spacy.load('en_core_web_sm')
+    # Load the English spaCy model
+    nlp_en = spacy.load('en_core_web_sm')
 
 
 # Load data in JSONL format (chunked for large files)
 def load_jsonl(file_path, num_lines=None, chunk_size=1000):
     data = []
+    # Timed per chunk: a stage() around the loop would include the caller's work between yields
+    start = time.perf_counter()
     with open(file_path, 'r', encoding='utf-8') as f:
         for i, line in enumerate(f):
             if num_lines and i >= num_lines:
@@ -19,10 +24,16 @@ def load_jsonl(file_path, num_lines=None, chunk_size=1000):
                 data.append(json.loads(line))
             except json.JSONDecodeError:
                 print(f"Skipping invalid line: {line}")
+                instr.count("invalid_lines")
 
             if len(data) >= chunk_size:
+                instr.record("json_parse", time.perf_counter() - start)
+                instr.count("lines_parsed", len(data))
                 yield data
                 data = []
+                start = time.perf_counter()
+    instr.record("json_parse", time.perf_counter() - start)
+    instr.count("lines_parsed", len(data))
     if data:
         yield data
 
@@ -57,7 +68,7 @@ def preprocess_topics(topic):
 
 # Save data in JSONL format
 def save_preprocessed_data(file_path, data, mode='a'):
-    with open(file_path, mode, encoding='utf-8') as f:
+    with instr.stage("file_write"), open(file_path, mode, encoding='utf-8') as f:
         for item in data:
             if item is not None:
                 f.write(json.dumps(item, ensure_ascii=False) + '\n')
@@ -74,7 +85,9 @@ def main():
 
     # Process Russian documents
     for chunk in load_jsonl('../data/raw_data/rus/docs.jsonl', num_lines=num_documents, chunk_size=1000):
-        processed_docs = [preprocess_russian(doc) for doc in chunk]
+        with instr.stage("preprocess_documents"):
+            processed_docs = [preprocess_russian(doc) for doc in chunk]
+        instr.count("documents_processed", len(processed_docs))
         save_preprocessed_data('../data/processed_data/russian_documents.jsonl', processed_docs, mode='a')
         print(f"Processed and saved {len(processed_docs)} Russian documents.")
 
@@ -84,10 +97,12 @@ def main():
         topics.extend(chunk)
 
     print(f"Loaded {len(topics)} topics.")
-    processed_topics = [preprocess_topics(topic) for topic in topics]
+    with instr.stage("preprocess_topics"):
+        processed_topics = [preprocess_topics(topic) for topic in topics]
     save_preprocessed_data('../data/processed_data/processed_topics.jsonl', processed_topics)
     print(f"Saved {len([t for t in processed_topics if t is not None])} processed topics.")
 
 
 if __name__ == "__main__":
-    main()
+    with instr.run("preprocess"):
+        main()
@@ -0,0 +1,127 @@
+import json
+import uuid
+
+import numpy as np
+
+# Configuration
+VOCAB_SIZE = 50000
+MEAN_DOC_LENGTH = 40
+MIN_DOC_LENGTH = 5
+ZIPF_EXPONENT = 1.1
+QUERY_TERMS = (3, 6)
+FIRST_TOPIC_ID = 300
+SEED = 42
+
+# Syllables used to build pseudo-words; word i in both vocabularies shares the
+# same id, which doubles as a perfect bilingual dictionary for translation.
+RUSSIAN_SYLLABLES = [c + v for c in "бвгдзклмнпрстфхцчшщ" for v in "аеиоуыюя"]
+ENGLISH_SYLLABLES = [c + v for c in "bcdfghklmnprstvwz" for v in "aeiou"]
+
+
+def _make_vocab(syllables, vocab_size):
+    # Spell out each index in base len(syllables) so every word is unique
+    base = len(syllables)
+    vocab = []
+    for i in range(vocab_size):
+        n, parts = i + base, []
+        while n:
+            n, r = divmod(n, base)
+            parts.append(syllables[r])
+        vocab.append("".join(reversed(parts)))
+    return vocab
+
+
+def build_vocabularies(vocab_size=VOCAB_SIZE):
+    """Return aligned (russian, english) pseudo-word vocabularies"""
+    return _make_vocab(RUSSIAN_SYLLABLES, vocab_size), _make_vocab(ENGLISH_SYLLABLES, vocab_size)
+
+
+def synthetic_doc_id(index):
+    """Deterministic UUID string for a document index, shaped like NeuCLIR ids"""
+    return str(uuid.UUID(int=(0x5EED << 96) | int(index)))
+
+
+def generate_corpus(num_docs, vocab_size=VOCAB_SIZE, mean_doc_length=MEAN_DOC_LENGTH,
+                    seed=SEED, chunk_size=1_000_000):
+    """Sample a Zipf-distributed corpus.
+
+    Documents are returned as a flat int32 token array plus an offsets array
+    (document i spans tokens[offsets[i]:offsets[i + 1]]), which keeps 10M-doc
+    corpora compact enough to hold in memory.
+    """
+    rng = np.random.default_rng(seed)
+    lengths = np.maximum(rng.poisson(mean_doc_length, num_docs), MIN_DOC_LENGTH)
+    offsets = np.zeros(num_docs + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    probs = 1.0 / np.arange(1, vocab_size + 1) ** ZIPF_EXPONENT
+    probs /= probs.sum()
+    # Shuffle ranks so frequent terms are spread over the id space
+    ranked_ids = rng.permutation(vocab_size).astype(np.int32)
+
+    tokens = np.empty(offsets[-1], dtype=np.int32)
+    for start in range(0, len(tokens), chunk_size):
+        end = min(start + chunk_size, len(tokens))
+        tokens[start:end] = ranked_ids[rng.choice(vocab_size, size=end - start, p=probs)]
+    return tokens, offsets
+
+
+def generate_queries(tokens, offsets, num_queries, seed=SEED):
+    """Build queries from terms of a randomly chosen target document.
+
+    Returns (query_terms, relevant_docs) where query_terms is a list of token id
+    arrays and relevant_docs[i] is the index of the document query i came from.
+    """
+    rng = np.random.default_rng(seed + 1)
+    num_docs = len(offsets) - 1
+    relevant_docs = rng.integers(0, num_docs, num_queries)
+    query_terms = []
+    for doc_idx in relevant_docs:
+        doc_tokens = np.unique(tokens[offsets[doc_idx]:offsets[doc_idx + 1]])
+        n_terms = min(int(rng.integers(QUERY_TERMS[0], QUERY_TERMS[1] + 1)), len(doc_tokens))
+        query_terms.append(rng.choice(doc_tokens, size=n_terms, replace=False))
+    return query_terms, relevant_docs
+
+
+def topic_ids(num_queries):
+    return [str(FIRST_TOPIC_ID + i) for i in range(num_queries)]
+
+
+def doc_text(tokens, offsets, index, vocab):
+    return " ".join(vocab[t] for t in tokens[offsets[index]:offsets[index + 1]])
+
+
+def iter_documents(tokens, offsets, vocab, limit=None):
+    """Yield documents in the {"id", "text"} shape of russian_documents.jsonl"""
+    num_docs = len(offsets) - 1 if limit is None else min(limit, len(offsets) - 1)
+    for i in range(num_docs):
+        yield {"id": synthetic_doc_id(i), "text": doc_text(tokens, offsets, i, vocab)}
+
+
+def iter_topics(query_terms, vocab):
+    """Yield topics in the {"text", "topic_id"} shape of processed_topics.jsonl"""
+    for topic_id, terms in zip(topic_ids(len(query_terms)), query_terms):
+        yield {"text": " ".join(vocab[t] for t in terms), "topic_id": topic_id}
+
+
+def raw_topic(topic):
+    """Wrap a processed topic in the raw NeuCLIR topic layout used by preprocess_topics"""
+    return {
+        "topic_id": topic["topic_id"],
+        "topics": [{"lang": "eng", "topic_title": "", "topic_description": topic["text"]}],
+    }
+
+
+def qrels_lines(relevant_docs, gain=3):
+    """Qrels in the '<qid> 0 <docid> <gain>' layout of the NeuCLIR qrels file"""
+    for topic_id, doc_idx in zip(topic_ids(len(relevant_docs)), relevant_docs):
+        yield f"{topic_id} 0 {synthetic_doc_id(doc_idx)} {gain}"
+
+
+def write_jsonl(file_path, records):
+    count = 0
+    with open(file_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
@@ -1,8 +1,11 @@
 import numpy as np
+import instrumentation as instr
 
-# Load embeddings
-doc_emb = np.load("../data/embeddings/russian_docs.npy")
-query_emb = np.load("../data/embeddings/english_queries.npy")
+with instr.run("verify_embeddings"):
+    # Load embeddings
+    with instr.stage("load_embeddings"):
+        doc_emb = np.load("../data/embeddings/russian_docs.npy")
+        query_emb = np.load("../data/embeddings/english_queries.npy")
 
-print("Document embeddings shape:", doc_emb.shape)  # Should be (1000, 768)
-print("Query embeddings shape:", query_emb.shape)    # Should be (93, 768)
\ No newline at end of file
+    print("Document embeddings shape:", doc_emb.shape)  # Should be (1000, 768)
+    print("Query embeddings shape:", query_emb.shape)    # Should be (93, 768)
\ No newline at end of file